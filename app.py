@@ -1,40 +1,159 @@
 import os
+import io
+import json
+import math
+import base64
+import logging
 from datetime import datetime
-import traceback
-from flask import Flask, render_template, request, jsonify
+import click
+from flask import Flask, Response, abort, render_template, request, jsonify, stream_with_context
 from flask_restful import Api, Resource, reqparse
 from werkzeug.datastructures import FileStorage
-from werkzeug.utils import secure_filename
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 
-from models import Workout, UserProfile
-from database import db
+from models import Workout, UserProfile, RouteRollup, WorkoutRollup, calculate_calories_burned, calculate_pace, calories_burned_sql, recalculate_workouts, DEFAULT_WEIGHT
+from cache import HttpCache, ResponseCache, init_versioning
+from database import DEFAULT_SQLITE_PRAGMAS, configure_sqlite, db, init_read_session, read_session, upgrade_schema
+from images import ImageProcessor, variants_enabled
+from logs import configure_logging
+from metrics import CacheCounters, Metrics
+from search import build_match_query, search_matches, setup_search
+from stats import apply_to_rollups, profile_stats, rebuild_rollups
 
-print("Starting app creation in app.py")
+logger = logging.getLogger('workouts')
 
-def create_app():
+def encode_cursor(date, id):
+    # Opaque token for the last (date, id) pair returned on a page
+    raw = json.dumps([date.isoformat(), id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        date, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date), int(id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def parse_workout(data):
+    # Column values for a new workout from form or JSON data, raises ValueError on bad input
+    missing = [field for field in ('duration', 'distance', 'route_nickname', 'date') if data.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required field(s): {', '.join(missing)}")
+
+    values = {
+        'profile': int(data.get('profile', 1)),
+        'duration': float(data['duration']),
+        'distance': float(data['distance']),
+        'route_nickname': str(data['route_nickname']),
+        'date': datetime.fromisoformat(data['date']),
+        'heart_rate': int(data['heart_rate']) if data.get('heart_rate') else None,
+        'idempotency_key': str(data['idempotency_key']) if data.get('idempotency_key') else None
+    }
+    if not math.isfinite(values['duration']) or not math.isfinite(values['distance']):
+        raise ValueError("Duration and distance must be finite numbers.")
+    if values['duration'] <= 0 or values['distance'] <= 0:
+        raise ValueError("Duration and distance must be positive.")
+    if len(values['route_nickname']) > 100:
+        raise ValueError("Route nickname must be at most 100 characters.")
+    if values['idempotency_key'] and len(values['idempotency_key']) > 64:
+        raise ValueError("Idempotency key must be at most 64 characters.")
+    return values
+
+
+def create_app(config=None):
+    configure_logging()
+    logger.info("Starting app creation")
     app = Flask(__name__)
     
     basedir = os.path.abspath(os.path.dirname(__file__))
     db_path = os.path.join(basedir, 'workouts.db')
     
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    # DATABASE_URL lets the same code run against another database, e.g. Postgres
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', f'sqlite:///{db_path}')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['UPLOAD_FOLDER'] = 'static/uploads'
+    app.config['SQLITE_PRAGMAS'] = dict(DEFAULT_SQLITE_PRAGMAS)
+    app.config['SQLITE_BEGIN_IMMEDIATE'] = True
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['UPLOAD_FOLDER'] = os.path.join(basedir, 'static', 'uploads')
+    app.config['IMAGE_WORKERS'] = 2
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = 512
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+    app.config['RESPONSE_CACHE_TTL'] = 60  # seconds
+    app.config['WORKOUTS_PAGE_SIZE'] = 50
+    app.config['WORKOUTS_MAX_PAGE_SIZE'] = 200
+    app.config['WORKOUTS_STREAM_BATCH_SIZE'] = 500
+    app.config['WORKOUTS_BATCH_MAX_ROWS'] = 5000
+    app.config['WORKOUTS_BATCH_MAX_BYTES'] = 8 * 1024 * 1024
+    app.config['WORKOUTS_BATCH_CHUNK_SIZE'] = 500
+    app.config['STATS_MAX_ROUTES'] = 50  # Routes listed in best_pace_by_route, most run first
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') == '1'
+    # Profile a sample of requests and keep pstats dumps of those slower than the threshold
+    app.config['PROFILE_SLOW_REQUESTS_MS'] = float(os.environ['PROFILE_SLOW_REQUESTS_MS']) if os.environ.get('PROFILE_SLOW_REQUESTS_MS') else None
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.update(config or {})
+
+    # In-memory SQLite gets a StaticPool, which doesn't take pool sizes, and a second
+    # engine would open a separate empty database, so there reads share the default engine
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        engine_options = {'pool_size': app.config['DB_POOL_SIZE'], 'max_overflow': app.config['DB_MAX_OVERFLOW']}
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options)
+        # Read-only request handlers use their own engine and session, see database.read_session
+        app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(
+            'read', dict(engine_options, url=app.config['SQLALCHEMY_DATABASE_URI'])
+        )
     
-    print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    logger.info("Configuring database", extra={
+        'database_uri': make_url(app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True)
+    })
     
     db.init_app(app)
+    metrics = Metrics()
+    with app.app_context():
+        configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'], begin_immediate=app.config['SQLITE_BEGIN_IMMEDIATE'])
+        if 'read' in db.engines:
+            configure_sqlite(db.engines['read'], app.config['SQLITE_PRAGMAS'], read_only=True)
+        init_read_session(app)
+        if app.config['METRICS_ENABLED']:
+            metrics.init_app(app, db.engines.values())
     api = Api(app)
+    images = ImageProcessor(app.config['UPLOAD_FOLDER'], max_workers=app.config['IMAGE_WORKERS'])
+    response_cache = ResponseCache(
+        max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+        ttl=app.config['RESPONSE_CACHE_TTL']
+    )
+    http_cache = HttpCache(api, response_cache)
 
     with app.app_context():
-        print("Creating database tables...")
+        logger.info("Creating database tables")
         db.create_all()
-        print("Database tables created.")
+        upgrade_schema()
+        # Fill in pace and calories for workouts stored before they were columns
+        db.session.execute(recalculate_workouts(or_(Workout.pace.is_(None), Workout.calories_burned.is_(None))))
+        if (WorkoutRollup.query.first() is None or RouteRollup.query.first() is None) and Workout.query.first() is not None:
+            # Rollup tables were just added to a database that already has workouts
+            rebuild_rollups()
+        db.session.commit()
+        init_versioning()
+        app.config['SEARCH_FTS5'] = setup_search(db.engine)
+        logger.info("Database tables created", extra={'search_backend': 'fts5' if app.config['SEARCH_FTS5'] else 'like'})
 
     @app.route('/')
     def index():
         return render_template('index.html')
 
+    if app.config['METRICS_ENABLED']:
+        @app.route('/metrics')
+        def prometheus_metrics():
+            # Per process: with several workers, scrape each one or aggregate downstream
+            return Response(metrics.render([CacheCounters(response_cache)]), mimetype='text/plain; version=0.0.4')
+
     # Request parser for workout creation
     workout_parser = reqparse.RequestParser()
     workout_parser.add_argument('profile', type=int, default=1, help='Profile ID')
@@ -51,25 +170,76 @@ def create_app():
     profile_parser.add_argument('weight', type=float, required=True, help='Weight in lbs is required')
 
     class WorkoutAPI(Resource):
+        @http_cache.cached('user_profile', 'workout')
         def get(self):
             query = request.args.get('q', '')
-            if query:
-                workouts = Workout.query.filter(Workout.route_nickname.ilike(f'%{query}%')).order_by(Workout.date.desc()).all()
+            workouts = read_session.query(Workout, UserProfile.name).outerjoin(UserProfile, UserProfile.id == Workout.profile)
+
+            match_query = build_match_query(query) if query and app.config['SEARCH_FTS5'] else None
+            if match_query:
+                matches = search_matches(match_query)
+                workouts = workouts.join(matches, matches.c.rowid == Workout.id)
+            elif query:
+                # No FTS5 index (or nothing to tokenize), fall back to a full scan
+                workouts = workouts.filter(Workout.route_nickname.ilike(f'%{query}%'))
+            # Relevance order only makes sense for indexed searches and isn't keyset-paginated
+            ranked = match_query is not None and request.args.get('sort') == 'relevance'
+
+            cursor = request.args.get('cursor')
+            if cursor and not ranked:
+                try:
+                    cursor_date, cursor_id = decode_cursor(cursor)
+                except ValueError:
+                    return {"message": "Invalid cursor."}, 400
+                # Keyset pagination: continue strictly after the last (date, id) seen
+                workouts = workouts.filter(or_(
+                    Workout.date < cursor_date,
+                    and_(Workout.date == cursor_date, Workout.id < cursor_id)
+                ))
+            if ranked:
+                workouts = workouts.order_by(matches.c.rank, Workout.id.desc())
             else:
-                workouts = Workout.query.order_by(Workout.date.desc()).all()
+                workouts = workouts.order_by(Workout.date.desc(), Workout.id.desc())
+
+            if request.args.get('format') == 'ndjson':
+                return self._stream(workouts)
+
+            try:
+                limit = int(request.args.get('limit', app.config['WORKOUTS_PAGE_SIZE']))
+            except ValueError:
+                return {"message": "limit must be an integer."}, 400
+            limit = max(1, min(limit, app.config['WORKOUTS_MAX_PAGE_SIZE']))
 
-            workout_dicts = []
-            profiles = {profile.id: profile for profile in UserProfile.query.all()}
-            default_profile = UserProfile(id=0, name="Unknown", weight=150)  # Default profile
+            # Fetch one extra row to know whether another page exists
+            rows = workouts.limit(limit + 1).all()
+            with metrics.serialization_timer():
+                workout_dicts = [self._serialize(workout, profile_name) for workout, profile_name in rows[:limit]]
 
-            for workout in workouts:
-                workout_dict = workout.to_dict()
-                profile = profiles.get(workout.profile, default_profile)
-                workout_dict['profile_name'] = profile.name
-                workout_dict['calories_burned'] = workout.calculate_calories_burned(profile.weight)
-                workout_dicts.append(workout_dict)
+            headers = {}
+            if len(rows) > limit and not ranked:
+                last_workout = rows[limit - 1][0]
+                headers['X-Next-Cursor'] = encode_cursor(last_workout.date, last_workout.id)
+            return workout_dicts, 200, headers
 
-            return workout_dicts
+        def _serialize(self, workout, profile_name):
+            # Pace and calories are stored columns, so this is a pure projection
+            workout_dict = workout.to_dict()
+            workout_dict['profile_name'] = profile_name or "Unknown"
+            return workout_dict
+
+        def _stream(self, workouts):
+            def generate():
+                # yield_per keeps a server-side cursor open and only buffers one
+                # batch of ORM objects at a time, so a full export uses constant memory
+                rows = read_session.execute(
+                    workouts.statement.execution_options(yield_per=app.config['WORKOUTS_STREAM_BATCH_SIZE'])
+                )
+                for workout, profile_name in rows:
+                    with metrics.serialization_timer():
+                        line = json.dumps(self._serialize(workout, profile_name)) + '\n'
+                    yield line
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
         def post(self):
             if not request.content_type.startswith('multipart/form-data'):
@@ -80,60 +250,240 @@ def create_app():
                 data = request.form.to_dict()
                 image = request.files.get('image')
                 
-                new_workout = Workout(
-                    profile=int(data.get('profile', 1)),
-                    duration=float(data['duration']),
-                    distance=float(data['distance']),
-                    route_nickname=data['route_nickname'],
-                    date=datetime.fromisoformat(data['date']),
-                    heart_rate=int(data['heart_rate']) if data.get('heart_rate') else None
-                )
+                try:
+                    values = parse_workout(data)
+                except (TypeError, ValueError) as e:
+                    return {'message': str(e)}, 400
+
+                if values['idempotency_key']:
+                    existing = Workout.query.filter_by(idempotency_key=values['idempotency_key']).first()
+                    if existing:
+                        # A retry of a workout we already stored
+                        return existing.to_dict(), 200
+
+                new_workout = Workout(**values)
                 
                 if image and image.filename != '':
-                    filename = secure_filename(image.filename)
-                    image_filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-                    image.save(os.path.join(app.config['UPLOAD_FOLDER'], image_filename))
-                    new_workout.image_filename = image_filename
-                
-                db.session.add(new_workout)
-                db.session.commit()
+                    new_workout.image_filename = images.save(image)
                 
                 profile = UserProfile.query.get(new_workout.profile)
                 if not profile:
                     # If the profile doesn't exist, create a default one
-                    profile = UserProfile(id=1, name="Unknown", weight=150)
+                    profile = UserProfile(id=new_workout.profile, name="Unknown", weight=DEFAULT_WEIGHT)
                     db.session.add(profile)
-                    db.session.commit()
-                
-                calories_burned = new_workout.calculate_calories_burned(profile.weight)
+                new_workout.update_derived(profile.weight)
 
-                response_data = new_workout.to_dict()
-                response_data['calories_burned'] = calories_burned
+                # Workout, default profile and rollups go out in a single transaction
+                db.session.add(new_workout)
+                try:
+                    db.session.flush()
+                except IntegrityError:
+                    db.session.rollback()
+                    if not values['idempotency_key']:
+                        raise
+                    # A concurrent retry with the same key committed first
+                    existing = Workout.query.filter_by(idempotency_key=values['idempotency_key']).first()
+                    if existing is None:
+                        raise
+                    return existing.to_dict(), 200
+                apply_to_rollups([new_workout])
+                db.session.commit()
 
-                return response_data, 201
+                if new_workout.image_filename:
+                    # Thumbnails and WebP variants are rendered off the request thread
+                    images.submit(new_workout.image_filename)
+                
+                return new_workout.to_dict(), 201
             except Exception as e:
-                print("Error occurred:")
-                print(traceback.format_exc())
+                logger.exception("Failed to create workout")
                 return {'message': str(e)}, 500
 
         def delete(self, id):
             workout = Workout.query.get_or_404(id)
             db.session.delete(workout)
+            apply_to_rollups([workout], sign=-1)
             db.session.commit()
             return '', 204
 
+    class WorkoutBatchAPI(Resource):
+        def post(self):
+            max_bytes = app.config['WORKOUTS_BATCH_MAX_BYTES']
+            too_large = {"message": f"Batch uploads are limited to {max_bytes} bytes."}, 413
+            if request.content_length is not None and request.content_length > max_bytes:
+                return too_large
+            # Reads are bounded by what is left of max_bytes, so an oversized body
+            # (or a single huge line) is rejected without being read or parsed
+            stream = io.BufferedReader(request.stream)
+
+            if request.mimetype == 'application/x-ndjson':
+                rows = []
+                size = 0
+                while line := stream.readline(max_bytes + 1 - size):
+                    size += len(line)
+                    if size > max_bytes:
+                        return too_large
+                    if line.strip():
+                        try:
+                            rows.append(json.loads(line))
+                        except ValueError as e:
+                            rows.append(e)
+                        if len(rows) > app.config['WORKOUTS_BATCH_MAX_ROWS']:
+                            # Stop reading as soon as the batch is known to be too large
+                            return {"message": f"At most {app.config['WORKOUTS_BATCH_MAX_ROWS']} workouts per batch."}, 413
+            elif request.is_json:
+                body = stream.read(max_bytes + 1)
+                if len(body) > max_bytes:
+                    return too_large
+                try:
+                    rows = json.loads(body)
+                except ValueError:
+                    rows = None
+                if not isinstance(rows, list):
+                    return {"message": "Request body must be a JSON array of workouts."}, 400
+            else:
+                return {"message": "Unsupported Media Type. Use application/json or application/x-ndjson for batch uploads."}, 415
+
+            if len(rows) > app.config['WORKOUTS_BATCH_MAX_ROWS']:
+                return {"message": f"At most {app.config['WORKOUTS_BATCH_MAX_ROWS']} workouts per batch."}, 413
+
+            results = [None] * len(rows)
+            pending = []
+            first_with_key = {}
+            for index, row in enumerate(rows):
+                try:
+                    if isinstance(row, Exception):
+                        raise ValueError(f"Invalid JSON: {row}")
+                    if not isinstance(row, dict):
+                        raise ValueError("Each workout must be a JSON object.")
+                    values = parse_workout(row)
+                except (TypeError, ValueError) as e:
+                    results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+                    continue
+
+                key = values['idempotency_key']
+                if key and key in first_with_key:
+                    # Repeated within this batch, resolved to the first row's id below
+                    results[index] = {'index': index, 'status': 'duplicate', 'duplicate_of': first_with_key[key]}
+                    continue
+                if key:
+                    first_with_key[key] = index
+                pending.append((index, values))
+
+            chunk_size = app.config['WORKOUTS_BATCH_CHUNK_SIZE']
+            for start in range(0, len(pending), chunk_size):
+                self._insert_chunk(pending[start:start + chunk_size], results)
+
+            for result in results:
+                if 'duplicate_of' in result:
+                    result['id'] = results[result.pop('duplicate_of')].get('id')
+
+            return {
+                'created': sum(result['status'] == 'created' for result in results),
+                'duplicates': sum(result['status'] == 'duplicate' for result in results),
+                'errors': sum(result['status'] == 'error' for result in results),
+                'results': results
+            }
+
+        def _insert_chunk(self, chunk, results):
+            # One transaction and one multi-row INSERT per chunk instead of a commit per workout
+            new_rows = self._skip_existing(chunk, results)
+            if not new_rows:
+                return
+
+            profile_ids = {values['profile'] for _, values in new_rows}
+            weights = dict(db.session.execute(
+                select(UserProfile.id, UserProfile.weight).where(UserProfile.id.in_(profile_ids))
+            ).all())
+            for _, values in new_rows:
+                values['pace'] = calculate_pace(values['duration'], values['distance'])
+                values['calories_burned'] = calculate_calories_burned(
+                    values['duration'], values['distance'], weights.get(values['profile'], DEFAULT_WEIGHT)
+                )
+
+            try:
+                ids = self._insert_rows([values for _, values in new_rows])
+                db.session.commit()
+            except IntegrityError:
+                # Retry one row per transaction so a failing row (e.g. an idempotency
+                # key a concurrent retry just claimed) only fails itself
+                db.session.rollback()
+                for row in new_rows:
+                    self._insert_row(row, results)
+                return
+
+            for (index, _), id in zip(new_rows, ids):
+                results[index] = {'index': index, 'status': 'created', 'id': id}
+
+        def _insert_row(self, row, results):
+            if not self._skip_existing([row], results):
+                return
+            index, values = row
+            try:
+                id, = self._insert_rows([values])
+                db.session.commit()
+            except IntegrityError as e:
+                db.session.rollback()
+                results[index] = {'index': index, 'status': 'error', 'message': f"Could not insert workout: {e.orig}"}
+                return
+            results[index] = {'index': index, 'status': 'created', 'id': id}
+
+        def _skip_existing(self, rows, results):
+            # Marks rows whose idempotency key is already stored as duplicates, returns the rest
+            keys = [values['idempotency_key'] for _, values in rows if values['idempotency_key']]
+            existing = {}
+            if keys:
+                existing = dict(db.session.execute(
+                    select(Workout.idempotency_key, Workout.id).where(Workout.idempotency_key.in_(keys))
+                ).all())
+
+            new_rows = []
+            for index, values in rows:
+                if values['idempotency_key'] in existing:
+                    results[index] = {'index': index, 'status': 'duplicate', 'id': existing[values['idempotency_key']]}
+                else:
+                    new_rows.append((index, values))
+            return new_rows
+
+        def _insert_rows(self, rows):
+            # Missing profiles are created with the default weight, as the single POST does
+            profile_ids = {values['profile'] for values in rows}
+            existing = set(db.session.scalars(select(UserProfile.id).where(UserProfile.id.in_(profile_ids))))
+            missing = sorted(profile_ids - existing)
+            if missing:
+                db.session.execute(insert(UserProfile), [
+                    {'id': profile_id, 'name': "Unknown", 'weight': DEFAULT_WEIGHT} for profile_id in missing
+                ])
+            ids = db.session.scalars(
+                insert(Workout).returning(Workout.id, sort_by_parameter_order=True), rows
+            ).all()
+            apply_to_rollups(rows)
+            return ids
+
+    def update_calories(profile_id, weight):
+        # One bulk UPDATE for the profile's workouts instead of recalculating them on every read
+        db.session.execute(
+            update(Workout).where(Workout.profile == profile_id).values(calories_burned=calories_burned_sql(weight))
+        )
+        rebuild_rollups(profile_id)
+
     class UserProfileAPI(Resource):
+        @http_cache.cached('user_profile')
         def get(self, id=None):
             if id is None:
-                profiles = UserProfile.query.all()
+                profiles = read_session.scalars(select(UserProfile)).all()
                 if not profiles:
-                    default_profile = UserProfile(id=1, name="Unknown", weight=150)  # Default values
+                    # Only the first visit writes; end the read transaction before taking the write lock
+                    read_session.close()
+                    default_profile = UserProfile(id=1, name="Unknown", weight=DEFAULT_WEIGHT)  # Default values
                     db.session.add(default_profile)
                     db.session.commit()
                     profiles = [default_profile]
-                return [profile.to_dict() for profile in profiles]
+                with metrics.serialization_timer():
+                    return [profile.to_dict() for profile in profiles]
             else:
-                profile = UserProfile.query.get_or_404(id)
+                profile = read_session.get(UserProfile, id)
+                if profile is None:
+                    abort(404)
                 return profile.to_dict()
 
         def put(self, id=None):
@@ -153,9 +503,13 @@ def create_app():
             parser.add_argument('weight', type=float, required=True, help='Weight in lbs is required')
             args = parser.parse_args()
 
+            weight_changed = profile.weight != args['weight']
             profile.name = args['name']
             profile.weight = args['weight']
 
+            if weight_changed:
+                db.session.flush()  # Assigns the id of a new profile
+                update_calories(profile.id, profile.weight)
             db.session.commit()
             return profile.to_dict(), 201 if id is None else 200
 
@@ -168,23 +522,48 @@ def create_app():
             parser.add_argument('weight', type=float, required=True, help='Weight in lbs is required')
             args = parser.parse_args()
 
-            profile.weight = args['weight']
+            if profile.weight != args['weight']:
+                profile.weight = args['weight']
+                update_calories(profile.id, profile.weight)
             db.session.commit()
             return profile.to_dict()
 
         def delete(self, id):
             profile = UserProfile.query.get_or_404(id)
             db.session.delete(profile)
+            # Orphaned workouts fall back to the default weight, as they do when created without a profile
+            update_calories(id, DEFAULT_WEIGHT)
             db.session.commit()
             return '', 204
 
+    class ProfileStatsAPI(Resource):
+        @http_cache.cached('user_profile', 'workout', 'workout_rollup', 'route_rollup')
+        def get(self, id):
+            if read_session.get(UserProfile, id) is None:
+                abort(404)
+            return profile_stats(id, app.config['STATS_MAX_ROUTES'])
+
+    class CacheStatsAPI(Resource):
+        def get(self):
+            return response_cache.stats()
+
     api.add_resource(WorkoutAPI, '/api/v1/workouts', '/api/v1/workouts/<int:id>')
+    api.add_resource(WorkoutBatchAPI, '/api/v1/workouts/batch')
     api.add_resource(UserProfileAPI, '/api/v1/profile', '/api/v1/profile/<int:id>')
+    api.add_resource(ProfileStatsAPI, '/api/v1/profile/<int:id>/stats')
+    api.add_resource(CacheStatsAPI, '/api/v1/cache/stats')
+
+    @app.cli.command('render-images')
+    def render_images():
+        """Render missing thumbnails and WebP copies of stored uploads."""
+        if not variants_enabled():
+            raise click.ClickException("Pillow is not installed, install it to render image variants.")
+        click.echo(f"Rendered variants for {images.render_missing()} uploads.")
 
-    print("App creation completed in app.py")
+    logger.info("App creation completed")
     return app
 
 if __name__ == '__main__':
     app = create_app()
-    print(f"Database file location: {app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '')}")
+    logger.info("Starting development server", extra={'database_uri': make_url(app.config['SQLALCHEMY_DATABASE_URI']).render_as_string(hide_password=True)})
     app.run(debug=True)
\ No newline at end of file
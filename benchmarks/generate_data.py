@@ -0,0 +1,85 @@
+"""Seed a database with synthetic profiles and workouts.
+
+Rows go through PUT /api/v1/profile and POST /api/v1/workouts/batch, so pace,
+calories, rollups and the search index are filled in exactly as in production.
+
+Usage: python benchmarks/generate_data.py [--profiles 20] [--workouts 10000] [--database workouts.db]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from logs import configure_logging
+
+PLACES = ['Park', 'River', 'Lake', 'Hill', 'Harbor', 'Forest', 'Canal', 'Bridge', 'Campus', 'Beach']
+KINDS = ['Loop', 'Run', 'Trail', 'Sprint', 'Climb', 'Path', 'Lap', 'Out and Back']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+
+
+def synthetic_workout(rng, profile_ids, start, span_minutes):
+    distance = round(rng.uniform(1, 15), 2)
+    return {
+        'profile': rng.choice(profile_ids),
+        'duration': round(distance * rng.uniform(6, 12), 2),
+        'distance': distance,
+        'route_nickname': f"{rng.choice(PLACES)} {rng.choice(KINDS)} {rng.randint(1, 200)}",
+        'heart_rate': rng.randint(110, 180) if rng.random() < 0.8 else None,
+        'date': (start + timedelta(minutes=rng.randint(0, span_minutes))).isoformat(timespec='minutes')
+    }
+
+
+def seed_database(app, profiles, workouts, seed=42, batch_size=5000):
+    """Add profiles and workouts through the API. Returns the new profile ids."""
+    rng = random.Random(seed)
+    client = app.test_client()
+
+    profile_ids = []
+    for _ in range(profiles):
+        response = client.put('/api/v1/profile', json={
+            'name': f"{rng.choice(FIRST_NAMES)} {len(profile_ids) + 1}",
+            'weight': round(rng.uniform(110, 250), 1)
+        })
+        profile_ids.append(response.get_json()['id'])
+
+    start = datetime(2019, 1, 1)
+    span_minutes = 5 * 365 * 24 * 60
+    for offset in range(0, workouts, batch_size):
+        rows = [
+            synthetic_workout(rng, profile_ids, start, span_minutes)
+            for _ in range(min(batch_size, workouts - offset))
+        ]
+        response = client.post('/api/v1/workouts/batch', json=rows)
+        result = response.get_json()
+        if response.status_code != 200 or result['errors']:
+            raise RuntimeError(f"Batch upload failed: {result}")
+    return profile_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=20, help='Number of profiles to create')
+    parser.add_argument('--workouts', type=int, default=10000, help='Number of workouts to create')
+    parser.add_argument('--database', help="SQLite file to seed (defaults to the app's DATABASE_URL / workouts.db)")
+    parser.add_argument('--seed', type=int, default=42, help='Random seed, the same seed gives the same data')
+    args = parser.parse_args()
+
+    configure_logging(level='WARNING')
+    config = {}
+    if args.database:
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.abspath(args.database)}"
+    app = create_app(config)
+
+    started = time.perf_counter()
+    seed_database(app, args.profiles, args.workouts, seed=args.seed)
+    print(f"Added {args.profiles} profiles and {args.workouts} workouts in {time.perf_counter() - started:.1f}s "
+          f"to {app.config['SQLALCHEMY_DATABASE_URI']}")
+
+
+if __name__ == '__main__':
+    main()
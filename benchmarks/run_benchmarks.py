@@ -0,0 +1,344 @@
+"""Benchmark the workout and profile APIs and compare against a stored baseline.
+
+Runs each scenario against the Flask test client (on a freshly seeded temporary
+database unless --database is given) or against a running server with --url.
+Reports p50/p95/p99 latency, throughput and peak RSS, and exits non-zero when a
+scenario regresses by more than --tolerance compared to the baseline. A baseline
+records the run settings and the host it was measured on; comparing against one
+from other settings or another machine is refused (exit status 2). The
+in-process app runs with the response cache disabled, so repeated requests
+measure the handlers and the database rather than cache hits.
+
+Usage:
+    python benchmarks/run_benchmarks.py                    # compare against benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline    # record a new baseline on this machine
+    python benchmarks/run_benchmarks.py --url http://localhost:5000
+    python benchmarks/run_benchmarks.py --replay traffic.jsonl
+
+A replay file holds one request per line, e.g. {"method": "GET", "path": "/api/v1/workouts?q=park"},
+with an optional "json" body, or "form" fields for a multipart upload.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from app import create_app
+from database import db
+from generate_data import PLACES, seed_database, synthetic_workout
+from logs import configure_logging
+from models import UserProfile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+class TestClientTarget:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, form=None):
+        kwargs = {}
+        if json is not None:
+            kwargs['json'] = json
+        if form is not None:
+            kwargs.update(data=form, content_type='multipart/form-data')
+        # Closing the response runs the same close hooks a WSGI server would
+        with self.client.open(path, method=method, **kwargs) as response:
+            return response.status_code, response.headers, response.get_data()
+
+
+class HttpTarget:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, json=None, form=None):
+        headers = {}
+        body = None
+        if json is not None:
+            body = encode_json(json)
+            headers['Content-Type'] = 'application/json'
+        if form is not None:
+            boundary = uuid.uuid4().hex
+            body = b''.join(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                for name, value in form.items()
+            ) + f'--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+
+def encode_json(value):
+    return json.dumps(value).encode()
+
+
+def build_scenarios(target, rng, profile_ids):
+    """[(name, make_request)], make_request returns request kwargs or None when there is nothing left to do."""
+    cursors = []
+    path = '/api/v1/workouts?limit=200'
+    for _ in range(10):
+        _, headers, _ = target.request('GET', path)
+        if not headers.get('X-Next-Cursor'):
+            break
+        cursors.append(headers['X-Next-Cursor'])
+        path = f"/api/v1/workouts?limit=200&cursor={cursors[-1]}"
+
+    start = datetime(2019, 1, 1)
+    created = []
+
+    def create():
+        row = synthetic_workout(rng, profile_ids, start, 5 * 365 * 24 * 60)
+        return {
+            'method': 'POST', 'path': '/api/v1/workouts',
+            'form': {key: str(value) for key, value in row.items() if value is not None},
+            'on_response': lambda body: created.append(json.loads(body)['id'])
+        }
+
+    scenarios = [
+        ('list', lambda: {'method': 'GET', 'path': '/api/v1/workouts?limit=50'}),
+        ('search', lambda: {'method': 'GET', 'path': f"/api/v1/workouts?q={rng.choice(PLACES).lower()}%20{rng.randint(1, 200)}"}),
+        ('profile_list', lambda: {'method': 'GET', 'path': '/api/v1/profile'}),
+        ('profile_get', lambda: {'method': 'GET', 'path': f"/api/v1/profile/{rng.choice(profile_ids)}"}),
+        ('stats', lambda: {'method': 'GET', 'path': f"/api/v1/profile/{rng.choice(profile_ids)}/stats"}),
+        ('create', create),
+        ('profile_update', lambda: {
+            'method': 'PATCH', 'path': f"/api/v1/profile/{rng.choice(profile_ids)}",
+            'json': {'weight': round(rng.uniform(110, 250), 1)}
+        }),
+        # Removes the workouts the create scenario added
+        ('delete', lambda: {'method': 'DELETE', 'path': f"/api/v1/workouts/{created.pop()}"} if created else None)
+    ]
+    if cursors:
+        scenarios.insert(1, ('list_page', lambda: {'method': 'GET', 'path': f"/api/v1/workouts?limit=50&cursor={rng.choice(cursors)}"}))
+    return scenarios
+
+
+def replay_scenario(path):
+    with open(path) as f:
+        requests = itertools.cycle([json.loads(line) for line in f if line.strip()])
+    return [('replay', lambda: dict(next(requests)))]
+
+
+def run_scenario(target, make_request, count, warmup):
+    latencies = []
+    errors = 0
+    elapsed = 0.0
+    for i in range(warmup + count):
+        spec = make_request()
+        if spec is None:
+            break
+        on_response = spec.pop('on_response', None)
+        started = time.perf_counter()
+        status, _, body = target.request(**spec)
+        duration = time.perf_counter() - started
+        if status >= 400:
+            errors += 1
+        elif on_response:
+            on_response(body)
+        if i >= warmup:
+            latencies.append(duration * 1000)
+            elapsed += duration
+
+    if not latencies:
+        return None
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(quantiles[49], 3),
+        'p95_ms': round(quantiles[94], 3),
+        'p99_ms': round(quantiles[98], 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1)
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_settings(args):
+    # Everything besides the code that changes the numbers, recorded with the baseline
+    if args.url:
+        data = {'url': args.url}
+    elif args.database:
+        data = {'database': os.path.basename(args.database)}
+    else:
+        data = {'profiles': args.profiles, 'workouts': args.workouts}
+    return dict(
+        data, requests=args.requests, warmup=args.warmup, seed=args.seed,
+        replay=os.path.basename(args.replay) if args.replay else None
+    )
+
+
+def host_info():
+    cpu = platform.processor()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    return {
+        'system': platform.system(),
+        'machine': platform.machine(),
+        'cpu': cpu,
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version
+    }
+
+
+def mismatches(baseline, settings, host):
+    """Reasons the baseline isn't comparable with this run, empty when it is."""
+    reasons = []
+    for label, actual in (('settings', settings), ('host', host)):
+        expected = baseline.get(label)
+        if expected is None:
+            reasons.append(f"the baseline doesn't record its {label}")
+            continue
+        for key in sorted(set(expected) | set(actual)):
+            if expected.get(key) != actual.get(key):
+                reasons.append(f"{label} {key}: {actual.get(key)!r}, baseline {expected.get(key)!r}")
+    return reasons
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results['scenarios'].items():
+        expected = baseline.get('scenarios', {}).get(name)
+        if not expected:
+            continue
+        if result['p95_ms'] > expected['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms vs baseline {expected['p95_ms']}ms")
+        if result['throughput_rps'] < expected['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['throughput_rps']} req/s vs baseline {expected['throughput_rps']} req/s")
+        if result['errors'] > expected['errors']:
+            regressions.append(f"{name}: {result['errors']} errors vs baseline {expected['errors']}")
+    if 'peak_rss_mb' in results and baseline.get('peak_rss_mb'):
+        if results['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"peak RSS {results['peak_rss_mb']}MB vs baseline {baseline['peak_rss_mb']}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Benchmark a running server instead of the in-process test client')
+    parser.add_argument('--database', help='Use a copy of an already seeded SQLite file instead of a fresh temporary one')
+    parser.add_argument('--profiles', type=int, default=20, help='Profiles to seed the temporary database with')
+    parser.add_argument('--workouts', type=int, default=20000, help='Workouts to seed the temporary database with')
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per scenario')
+    parser.add_argument('--replay', help='JSONL file of requests to replay instead of the built-in scenarios')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data and requests')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown before failing')
+    args = parser.parse_args()
+
+    configure_logging(level='WARNING')
+    settings, host = run_settings(args), host_info()
+    baseline = None
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print("No baseline to compare against, run with --save-baseline first.")
+        else:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            # Checked before running, numbers from other settings or hardware aren't comparable
+            reasons = mismatches(baseline, settings, host)
+            if reasons:
+                print("Not comparable with the baseline:")
+                for reason in reasons:
+                    print(f"  {reason}")
+                print("Re-run with the baseline's settings, or record a baseline for this machine with --save-baseline.")
+                sys.exit(2)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.url:
+            target = HttpTarget(args.url)
+            _, _, body = target.request('GET', '/api/v1/profile')
+            profile_ids = [profile['id'] for profile in json.loads(body)]
+        else:
+            database = os.path.join(tmpdir, 'bench.db')
+            if args.database:
+                # The write scenarios run against a copy, the given file is never modified.
+                # The backup API also copies what is still in the -wal file.
+                source, copy = sqlite3.connect(args.database), sqlite3.connect(database)
+                source.backup(copy)
+                copy.close()
+                source.close()
+            uploads = os.path.join(tmpdir, 'uploads')
+            os.makedirs(uploads)
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.abspath(database)}",
+                'UPLOAD_FOLDER': uploads,
+                'RESPONSE_CACHE_MAX_ENTRIES': 0  # Measure the handlers, not the response cache
+            })
+            if args.database:
+                with app.app_context():
+                    profile_ids = list(db.session.scalars(select(UserProfile.id)))
+            else:
+                print(f"Seeding {args.profiles} profiles and {args.workouts} workouts...")
+                profile_ids = seed_database(app, args.profiles, args.workouts, seed=args.seed)
+            target = TestClientTarget(app)
+
+        if args.replay:
+            scenarios = replay_scenario(args.replay)
+        else:
+            scenarios = build_scenarios(target, rng, profile_ids)
+
+        results = {'settings': settings, 'host': host, 'scenarios': {}}
+        print(f"\n{'scenario':<16}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+        for name, make_request in scenarios:
+            result = run_scenario(target, make_request, args.requests, args.warmup)
+            if result is None:
+                continue
+            results['scenarios'][name] = result
+            print(f"{name:<16}{result['requests']:>9}{result['errors']:>8}{result['p50_ms']:>10.2f}"
+                  f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['throughput_rps']:>10.1f}")
+
+    if not args.url:
+        # Only meaningful in-process, where the app runs in this interpreter
+        results['peak_rss_mb'] = peak_rss_mb()
+        print(f"\npeak RSS: {results['peak_rss_mb']} MB")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if baseline is None:
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == '__main__':
+    main()
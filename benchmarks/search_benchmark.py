@@ -0,0 +1,88 @@
+"""Compare route-nickname search latency: FTS5 index vs. the ilike '%q%' scan.
+
+Usage: python benchmarks/search_benchmark.py [--workouts 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db
+from models import Workout
+from search import build_match_query, search_matches, setup_search
+
+PLACES = ['Park', 'River', 'Lake', 'Hill', 'Harbor', 'Forest', 'Canal', 'Bridge', 'Campus', 'Beach']
+KINDS = ['Loop', 'Run', 'Trail', 'Sprint', 'Climb', 'Path', 'Lap', 'Out and Back']
+QUERIES = ['park', 'riv', 'lake loop', 'harbor sprint', 'nosuchroute']
+
+
+def populate(engine, count, batch_size=50000):
+    rng = random.Random(42)
+    start = datetime(2015, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, count, batch_size):
+            rows = []
+            for _ in range(min(batch_size, count - offset)):
+                distance = round(rng.uniform(1, 15), 2)
+                rows.append({
+                    'profile': rng.randint(1, 100),
+                    'duration': round(distance * rng.uniform(6, 12), 2),
+                    'distance': distance,
+                    'route_nickname': f"{rng.choice(PLACES)} {rng.choice(KINDS)} {rng.randint(1, 500)}",
+                    'heart_rate': rng.randint(110, 180),
+                    'date': start + timedelta(minutes=rng.randint(0, 5_000_000)),
+                })
+            conn.execute(insert(Workout.__table__), rows)
+
+
+def time_query(engine, statement, repeat):
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(statement).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workouts', type=int, default=1_000_000, help='Number of synthetic workouts')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+    parser.add_argument('--limit', type=int, default=50, help='Page size, as in GET /api/v1/workouts')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        db.metadata.create_all(engine)
+        if not setup_search(engine):
+            sys.exit("This SQLite build has no FTS5 support, nothing to compare against.")
+
+        print(f"Generating {args.workouts} workouts...")
+        started = time.perf_counter()
+        populate(engine, args.workouts)
+        print(f"Done in {time.perf_counter() - started:.1f}s\n")
+
+        print(f"{'query':<16}{'scan median':>14}{'fts5 median':>14}{'scan max':>12}{'fts5 max':>12}")
+        for query in QUERIES:
+            page = select(Workout.id).order_by(Workout.date.desc(), Workout.id.desc()).limit(args.limit)
+            scan = page.where(Workout.route_nickname.ilike(f'%{query}%'))
+            matches = search_matches(build_match_query(query))
+            fts = page.join(matches, matches.c.rowid == Workout.id)
+
+            scan_median, scan_max = time_query(engine, scan, args.repeat)
+            fts_median, fts_max = time_query(engine, fts, args.repeat)
+            print(f"{query:<16}{scan_median:>12.2f}ms{fts_median:>12.2f}ms{scan_max:>10.2f}ms{fts_max:>10.2f}ms")
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Multi-process load test: default SQLite settings vs. the tuned engine configuration.
+
+Each worker process builds its own app, like a gunicorn worker, and drives it
+with a mix of workout list reads and single workout writes against a shared
+database file.
+
+Usage: python benchmarks/sqlite_load_test.py [--processes 8] [--duration 10] [--write-ratio 0.2] [--dir PATH]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from logs import configure_logging
+
+SCENARIOS = {
+    # Rollback journal, no busy timeout, deferred transactions: the old defaults
+    'default': {'SQLITE_PRAGMAS': {}, 'SQLITE_BEGIN_IMMEDIATE': False},
+    'tuned': {}
+}
+
+
+def quiet_app(config):
+    configure_logging(level='ERROR')
+    return create_app(config)
+
+
+def worker(config, start, duration, write_ratio, seed, results):
+    client = quiet_app(config).test_client()
+    rng = random.Random(seed)
+    ok = errors = 0
+    start.wait()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if rng.random() < write_ratio:
+            response = client.post('/api/v1/workouts', data={
+                'duration': f"{rng.uniform(20, 60):.2f}",
+                'distance': f"{rng.uniform(2, 8):.2f}",
+                'route_nickname': f"Route {rng.randint(1, 50)}",
+                'date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T07:00"
+            }, content_type='multipart/form-data')
+        else:
+            response = client.get('/api/v1/workouts?limit=20')
+        if response.status_code < 400:
+            ok += 1
+        else:
+            errors += 1
+    results.put((ok, errors))
+
+
+def run_scenario(name, args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmpdir:
+        config = dict(
+            SCENARIOS[name],
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmpdir, 'load.db')}",
+            UPLOAD_FOLDER=os.path.join(tmpdir, 'uploads'),
+            RESPONSE_CACHE_MAX_ENTRIES=0  # Measure the database, not the response cache
+        )
+        os.makedirs(config['UPLOAD_FOLDER'])
+        # Create the schema and profile once before the workers race to do it
+        quiet_app(config).test_client().put('/api/v1/profile', json={'name': 'Load Test', 'weight': 160})
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(config, start, args.duration, args.write_ratio, seed, results))
+            for seed in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        time.sleep(2)  # Let every worker finish creating its app
+        start.set()
+
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    ok = sum(result[0] for result in totals)
+    errors = sum(result[1] for result in totals)
+    return ok / args.duration, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8, help='Worker processes')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='Fraction of requests that are writes')
+    parser.add_argument('--dir', help='Where to put the database, fsync cost depends on the disk')
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes, {args.duration:g}s per scenario, {args.write_ratio:.0%} writes\n")
+    print(f"{'scenario':<10}{'requests/s':>12}{'errors':>10}")
+    for name in SCENARIOS:
+        throughput, errors = run_scenario(name, args)
+        print(f"{name:<10}{throughput:>12.1f}{errors:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, request
+from sqlalchemy import event, insert, select, update
+from werkzeug.http import http_date
+
+from database import db, read_session
+from models import TableVersion
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _record_flush(session, flush_context, instances):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in session.new | session.deleted:
+        changed.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            changed.add(obj.__table__.name)
+
+
+def _record_execute(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed = orm_execute_state.session.info.setdefault('changed_tables', set())
+        changed.add(orm_execute_state.statement.table.name)
+
+
+def _bump_versions(session):
+    session.flush()
+    changed = session.info.pop('changed_tables', set())
+    changed.discard(TableVersion.__tablename__)
+    if changed:
+        # Through the connection so the bump itself isn't recorded as a change
+        session.connection().execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.name.in_(changed))
+            .values(version=TableVersion.version + 1, updated_at=utcnow())
+        )
+
+
+def _forget_changes(session):
+    session.info.pop('changed_tables', None)
+
+
+def init_versioning():
+    """Bump TableVersion for every table a committed transaction wrote to."""
+    existing = set(db.session.scalars(select(TableVersion.name)))
+    missing = [
+        {'name': table.name, 'version': 0, 'updated_at': utcnow()}
+        for table in db.metadata.sorted_tables
+        if table.name not in existing and table.name != TableVersion.__tablename__
+    ]
+    if missing:
+        db.session.execute(insert(TableVersion), missing)
+        _forget_changes(db.session)
+    db.session.commit()
+
+    for name, listener in (
+        ('before_flush', _record_flush),
+        ('do_orm_execute', _record_execute),
+        ('before_commit', _bump_versions),
+        ('after_rollback', _forget_changes)
+    ):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
+
+
+class ResponseCache:
+    """Thread-safe LRU of serialized responses, bounded by entry count, total bytes and age."""
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'not_modified': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.counters['expirations'] += 1
+                self.counters['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1:]
+
+    def set(self, key, body, mimetype, headers):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, body, mimetype, headers)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.counters['evictions'] += 1
+
+    def _remove(self, key):
+        body = self.entries.pop(key)[1]
+        self.size -= len(body)
+
+    def record_not_modified(self):
+        with self.lock:
+            self.counters['not_modified'] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return dict(
+                self.counters,
+                entries=len(self.entries),
+                bytes=self.size,
+                hit_rate=round(self.counters['hits'] / lookups, 4) if lookups else None
+            )
+
+
+class HttpCache:
+    """ETag/Last-Modified validators and response caching for Flask-RESTful GET handlers."""
+
+    def __init__(self, api, response_cache):
+        self.api = api
+        self.response_cache = response_cache
+
+    def cached(self, *tables):
+        """Cache a GET handler whose output only depends on the given tables."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                versions = read_session.execute(
+                    select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+                    .where(TableVersion.name.in_(tables))
+                    .order_by(TableVersion.name)
+                ).all()
+                etag = '.'.join(f"{version}" for _, version, _ in versions)
+                last_modified = max((updated_at for _, _, updated_at in versions), default=None)
+                validators = {'ETag': f'W/"{etag}"', 'Cache-Control': 'no-cache'}
+                if last_modified:
+                    validators['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+
+                key = (request.path, tuple(sorted(request.args.items(multi=True))), etag)
+                cached_response = self.response_cache.get(key)
+                if cached_response is not None:
+                    body, mimetype, headers = cached_response
+                    response = Response(body, mimetype=mimetype, headers=headers)
+                else:
+                    response = fn(*args, **kwargs)
+                    if isinstance(response, Response):
+                        return response  # Streamed responses aren't cached
+                    response = self.api.make_response(*self._unpack(response))
+                    if response.status_code != 200:
+                        return response
+                    headers = {
+                        name: value for name, value in response.headers.items()
+                        if name not in ('Content-Type', 'Content-Length')
+                    }
+                    self.response_cache.set(key, response.get_data(), response.mimetype, headers)
+
+                # Only decided once the handler (or a cached copy of it) answered 200,
+                # so missing resources and bad arguments never turn into a 304
+                if self._not_modified(etag):
+                    self.response_cache.record_not_modified()
+                    response = Response(status=304)
+
+                response.headers.update(validators)
+                return response
+            return wrapper
+        return decorator
+
+    def _not_modified(self, etag):
+        # If-Modified-Since is ignored: it only has one-second precision, so a write in
+        # the same second as the client's read would be missed. Every response has an ETag.
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        return False
+
+    @staticmethod
+    def _unpack(value):
+        if isinstance(value, tuple):
+            data, code, headers = value + (None,) * (3 - len(value))
+            return data, code or 200, headers or {}
+        return value, 200, {}
@@ -1,3 +1,65 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import scoped_session, sessionmaker
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+# Session for read-only request handlers, bound to the 'read' engine by init_read_session()
+read_session = scoped_session(sessionmaker())
+
+# Applied to every new SQLite connection. WAL lets readers run while a writer
+# commits, and synchronous=NORMAL is durable in WAL mode except on power loss.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms to wait for a lock instead of failing with "database is locked"
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024  # negative means KiB, so 64 MiB per connection
+}
+
+
+def configure_sqlite(engine, pragmas, begin_immediate=False, read_only=False):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        if begin_immediate:
+            # Let SQLAlchemy emit BEGIN itself (see on_begin)
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+        cursor.close()
+
+    if begin_immediate:
+        @event.listens_for(engine, 'begin')
+        def on_begin(connection):
+            # Take the write lock up front. A deferred transaction that reads and
+            # then writes can't wait on busy_timeout and fails immediately instead.
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def init_read_session(app):
+    # Without a separate 'read' bind (in-memory SQLite) reads go through the default engine
+    read_session.configure(bind=db.engines.get('read', db.engine))
+    app.teardown_appcontext(lambda exc: read_session.remove())
+
+
+def upgrade_schema():
+    # db.create_all() only creates missing tables, so columns and indexes
+    # added to a model after its table already exists are applied here.
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
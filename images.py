@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, originals are still stored without it
+    Image = None
+
+logger = logging.getLogger('workouts.images')
+
+CHUNK_SIZE = 64 * 1024
+
+# Variant folder (under the upload folder) -> longest side in pixels
+VARIANTS = {
+    'thumbnails': 320,
+    'webp': 1600
+}
+
+
+def variants_enabled():
+    return Image is not None
+
+
+def renderable(image_filename):
+    # Only files with an extension Pillow has a plugin for, anything else would just log a failure
+    if not variants_enabled():
+        return False
+    return os.path.splitext(image_filename)[1].lower() in Image.registered_extensions()
+
+
+def variant_path(variant, image_filename):
+    stem = os.path.splitext(image_filename)[0]
+    return os.path.join(variant, f"{stem}.webp")
+
+
+class ImageProcessor:
+    """Stores uploads content-addressed and renders their variants on a thread pool."""
+
+    def __init__(self, upload_folder, max_workers=2):
+        self.upload_folder = upload_folder
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images')
+
+    def save(self, image):
+        """Stream a FileStorage to disk in chunks, returning its content-addressed filename.
+
+        Files are named after the SHA-256 of their contents, so uploading the
+        same picture twice stores it once.
+        """
+        extension = os.path.splitext(secure_filename(image.filename))[1].lower()
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.upload_folder, suffix='.part', delete=False) as tmp:
+            try:
+                for chunk in iter(lambda: image.stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+
+        image_filename = f"{digest.hexdigest()}{extension}"
+        path = os.path.join(self.upload_folder, image_filename)
+        if os.path.exists(path):
+            os.remove(tmp.name)
+        else:
+            os.replace(tmp.name, path)
+        return image_filename
+
+    def submit(self, image_filename):
+        """Render any missing variants of an upload in the background."""
+        if self._needs_variants(image_filename):
+            self.executor.submit(self._render_variants, image_filename)
+
+    def render_missing(self):
+        """Render missing variants of every stored upload in the calling thread, returning how many were rendered.
+
+        A one-off catch-up for uploads stored before variants existed or while
+        Pillow was missing, see the render-images command in app.py.
+        """
+        rendered = 0
+        for entry in os.scandir(self.upload_folder):
+            if entry.is_file() and self._needs_variants(entry.name):
+                self._render_variants(entry.name)
+                rendered += 1
+        return rendered
+
+    def _needs_variants(self, image_filename):
+        if not renderable(image_filename):
+            return False
+        return not all(
+            os.path.exists(os.path.join(self.upload_folder, variant_path(variant, image_filename))) for variant in VARIANTS
+        )
+
+    def _render_variants(self, image_filename):
+        source = os.path.join(self.upload_folder, image_filename)
+        try:
+            with Image.open(source) as original:
+                original = ImageOps.exif_transpose(original)
+                for variant, max_size in VARIANTS.items():
+                    target = os.path.join(self.upload_folder, variant_path(variant, image_filename))
+                    if os.path.exists(target):
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    resized = original.copy()
+                    resized.thumbnail((max_size, max_size))
+                    if resized.mode not in ('RGB', 'RGBA'):
+                        resized = resized.convert('RGBA')
+                    # Write then rename so a half-written variant is never served
+                    partial = f"{target}.{threading.get_ident()}.part"
+                    resized.save(partial, format='WEBP', quality=80)
+                    os.replace(partial, target)
+        except Exception:
+            logger.exception("Failed to render image variants", extra={'image_filename': image_filename})
@@ -0,0 +1,43 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has, everything else was passed through `extra`
+RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra` fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """Log to stderr as JSON (or plain text with LOG_FORMAT=text). Safe to call more than once."""
+    logger = logging.getLogger('workouts')
+    if logger.handlers:
+        return logger
+
+    logger.setLevel(level or os.environ.get('LOG_LEVEL', 'INFO'))
+
+    handler = logging.StreamHandler()
+    if (fmt or os.environ.get('LOG_FORMAT', 'json')) == 'text':
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.propagate = False
+    return logger
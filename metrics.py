@@ -0,0 +1,203 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('workouts.metrics')
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.values = {}  # labels -> [count per bucket..., sum, count]
+
+    def observe(self, labels, value):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{self.name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {series[-1]}')
+        return lines
+
+
+class Metrics:
+    """Per-process request metrics in Prometheus text format, plus an opt-in slow request profiler.
+
+    Nothing is hooked into Flask or SQLAlchemy unless init_app() is called.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.requests = Counter('http_requests_total', 'Requests handled, by endpoint, method and status.')
+        self.latency = Histogram('http_request_duration_seconds', 'Request latency, including streamed bodies.', LATENCY_BUCKETS)
+        self.sql_queries = Histogram('sql_queries_per_request', 'SQL statements executed per request.', QUERY_COUNT_BUCKETS)
+        self.sql_time = Histogram('sql_duration_seconds', 'Time spent executing SQL per request.', LATENCY_BUCKETS)
+        self.serialization_time = Histogram('serialization_duration_seconds', 'Time spent in to_dict() per request.', LATENCY_BUCKETS)
+        self.profiles = Counter('slow_request_profiles_total', 'cProfile dumps written for slow requests.')
+        self.profile_threshold = None
+        self.profile_sample_rate = 0
+        self.profile_dir = None
+
+    def init_app(self, app, engines):
+        self.enabled = True
+        if app.config.get('PROFILE_SLOW_REQUESTS_MS') is not None:
+            self.profile_threshold = app.config['PROFILE_SLOW_REQUESTS_MS'] / 1000
+            self.profile_sample_rate = app.config['PROFILE_SAMPLE_RATE']
+            self.profile_dir = app.config['PROFILE_DIR']
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @contextmanager
+    def serialization_timer(self):
+        if not self.enabled or not has_request_context():
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.metrics_serialization_time += time.perf_counter() - started
+
+    def render(self, counters=()):
+        """Prometheus text exposition of all metrics, plus extra Counter-like objects."""
+        with self.lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.sql_queries, self.sql_time, self.serialization_time, self.profiles, *counters):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_queries = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_serialization_time = 0.0
+        g.metrics_profiler = None
+        if self.profile_threshold is not None and random.random() < self.profile_sample_rate:
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+
+    def _after_request(self, response):
+        if 'metrics_started' not in g:
+            return response
+        # Recorded once the server closes the response, so streamed bodies are
+        # included. The request context may be gone by then, so capture it now.
+        state = g._get_current_object()
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        status = response.status_code
+        response.call_on_close(lambda: self._record(state, endpoint, method, status))
+        return response
+
+    def _record(self, state, endpoint, method, status):
+        elapsed = time.perf_counter() - state.metrics_started
+        labels = (('endpoint', endpoint), ('method', method))
+        with self.lock:
+            self.requests.inc(labels + (('status', status),))
+            self.latency.observe(labels, elapsed)
+            self.sql_queries.observe(labels, state.metrics_sql_queries)
+            self.sql_time.observe(labels, state.metrics_sql_time)
+            self.serialization_time.observe(labels, state.metrics_serialization_time)
+
+        profiler = state.metrics_profiler
+        if profiler is not None:
+            profiler.disable()
+            if elapsed >= self.profile_threshold:
+                self._dump_profile(profiler, endpoint, method, elapsed)
+
+    def _dump_profile(self, profiler, endpoint, method, elapsed):
+        name = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '_') or 'index'
+        path = os.path.join(
+            self.profile_dir,
+            f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{method}_{name}_{elapsed * 1000:.0f}ms.pstats"
+        )
+        profiler.dump_stats(path)
+        with self.lock:
+            self.profiles.inc((('endpoint', endpoint),))
+        logger.info("Wrote profile for slow request", extra={
+            'endpoint': endpoint, 'method': method, 'duration_ms': round(elapsed * 1000, 1), 'path': path
+        })
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, so a statement that raises leaves nothing behind
+        if context is not None:
+            context._metrics_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_query_started', None)
+        if started is None:
+            return
+        if has_request_context() and 'metrics_sql_queries' in g:
+            g.metrics_sql_queries += 1
+            g.metrics_sql_time += time.perf_counter() - started
+
+
+class CacheCounters:
+    """Exposes ResponseCache.stats() in the same text format."""
+
+    def __init__(self, response_cache):
+        self.response_cache = response_cache
+
+    def render(self):
+        stats = self.response_cache.stats()
+        lines = []
+        for key in ('hits', 'misses', 'evictions', 'expirations', 'not_modified'):
+            lines += [f'# TYPE response_cache_{key}_total counter', f'response_cache_{key}_total {stats[key]}']
+        for key in ('entries', 'bytes'):
+            lines += [f'# TYPE response_cache_{key} gauge', f'response_cache_{key} {stats[key]}']
+        return lines
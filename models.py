@@ -1,7 +1,22 @@
 from database import db
+from images import variant_path, variants_enabled
 from datetime import datetime
+from sqlalchemy import Numeric, case, cast, func, select, update
+
+DEFAULT_WEIGHT = 150  # lbs, used for workouts whose profile doesn't exist
+
+# MET value by running speed: (upper bound in mph, MET), slowest first
+MET_BY_SPEED = [(5, 6.0), (6, 8.3), (7, 9.8), (8, 11.0), (9, 11.8)]
+MAX_MET = 12.8
 
 class Workout(db.Model):
+    __table_args__ = (
+        db.Index('ix_workout_date_id', 'date', 'id'),  # Keyset pagination on (date, id)
+        db.Index('ix_workout_idempotency_key', 'idempotency_key', unique=True),
+        db.Index('ix_workout_profile_date', 'profile', 'date'),  # Per-profile recalculation
+        db.Index('ix_workout_profile_route_pace', 'profile', 'route_nickname', 'pace'),  # Best pace per route
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     profile = db.Column(db.Integer, nullable=False)  # Updated to Integer
     duration = db.Column(db.Float, nullable=False)  # Duration in minutes
@@ -10,6 +25,9 @@ class Workout(db.Model):
     heart_rate = db.Column(db.Integer)  # Average heart rate, optional
     date = db.Column(db.DateTime, nullable=False)  # Date and time of the workout
     image_filename = db.Column(db.String(255)) # Filename of the image
+    idempotency_key = db.Column(db.String(64))  # Client-supplied key so retried uploads aren't stored twice
+    pace = db.Column(db.Float)  # Minutes per mile, stored on write
+    calories_burned = db.Column(db.Float)  # From the profile's weight, recalculated when the weight changes
 
     def to_dict(self):
         return {
@@ -20,37 +38,25 @@ class Workout(db.Model):
             'route_nickname': self.route_nickname,
             'heart_rate': self.heart_rate,
             'date': self.date.isoformat(),
-            'pace': round(self.duration / self.distance, 2),
-            'image_url': f"/static/uploads/{self.image_filename}" if self.image_filename else None
+            'pace': self.pace,
+            'calories_burned': self.calories_burned,
+            'image_url': f"/static/uploads/{self.image_filename}" if self.image_filename else None,
+            'thumbnail_url': self.image_variant_url('thumbnails'),
+            'webp_url': self.image_variant_url('webp')
         }
 
+    def image_variant_url(self, variant):
+        # Variants are rendered in the background, so clients should fall back to image_url
+        if not self.image_filename or not variants_enabled():
+            return None
+        return f"/static/uploads/{variant_path(variant, self.image_filename)}"
+
     def calculate_calories_burned(self, weight_lbs):
-        # Convert weight from lbs to kg for calculation
-        weight_kg = weight_lbs * 0.453592
-        
-        # Calculate speed in mph
-        speed_mph = (self.distance / self.duration) * 60
-        
-        # Determine MET value based on speed (mph)
-        if speed_mph < 5:
-            met = 6.0
-        elif speed_mph < 6:
-            met = 8.3
-        elif speed_mph < 7:
-            met = 9.8
-        elif speed_mph < 8:
-            met = 11.0
-        elif speed_mph < 9:
-            met = 11.8
-        else:
-            met = 12.8
-
-        # Calculate calories burned
-        # Formula: calories = MET * weight in kg * duration in hours
-        duration_hours = self.duration / 60
-        calories = met * weight_kg * duration_hours
-        
-        return round(calories, 2)
+        return calculate_calories_burned(self.duration, self.distance, weight_lbs)
+
+    def update_derived(self, weight_lbs):
+        self.pace = calculate_pace(self.duration, self.distance)
+        self.calories_burned = self.calculate_calories_burned(weight_lbs)
 
 class UserProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,3 +70,93 @@ class UserProfile(db.Model):
             'weight': self.weight
         }
 
+class WorkoutRollup(db.Model):
+    # Running totals per profile and week/month/year, kept up to date by every workout write
+    profile = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(5), primary_key=True)  # 'week', 'month' or 'year'
+    bucket = db.Column(db.Date, primary_key=True)  # First day of the week (Monday), month or year
+    workout_count = db.Column(db.Integer, nullable=False, default=0)
+    total_distance = db.Column(db.Float, nullable=False, default=0)  # in miles
+    total_duration = db.Column(db.Float, nullable=False, default=0)  # in minutes
+    total_calories = db.Column(db.Float, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'period_start': self.bucket.isoformat(),
+            'workouts': self.workout_count,
+            'distance': round(self.total_distance, 2),
+            'duration': round(self.total_duration, 2),
+            'calories_burned': round(self.total_calories, 2),
+            'avg_distance': round(self.total_distance / self.workout_count, 2),
+            'avg_duration': round(self.total_duration / self.workout_count, 2),
+            'avg_pace': round(self.total_duration / self.total_distance, 2) if self.total_distance else None
+        }
+
+class RouteRollup(db.Model):
+    # Best pace and workout count per profile and route, kept up to date by every workout write
+    __table_args__ = (
+        db.Index('ix_route_rollup_profile_count', 'profile', 'workout_count'),  # Most run routes first
+    )
+
+    profile = db.Column(db.Integer, primary_key=True)
+    route_nickname = db.Column(db.String(100), primary_key=True)
+    workout_count = db.Column(db.Integer, nullable=False, default=0)
+    best_pace = db.Column(db.Float)  # Minutes per mile
+
+    def to_dict(self):
+        return {
+            'route_nickname': self.route_nickname,
+            'best_pace': self.best_pace,
+            'workouts': self.workout_count
+        }
+
+class TableVersion(db.Model):
+    # Bumped in the same transaction as any write to the named table, used for HTTP validators
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+def calculate_pace(duration, distance):
+    return round(duration / distance, 2)
+
+def calculate_calories_burned(duration, distance, weight_lbs):
+    # Convert weight from lbs to kg for calculation
+    weight_kg = weight_lbs * 0.453592
+    
+    # Calculate speed in mph
+    speed_mph = (distance / duration) * 60
+    
+    # Determine MET value based on speed (mph)
+    met = MAX_MET
+    for max_speed, speed_met in MET_BY_SPEED:
+        if speed_mph < max_speed:
+            met = speed_met
+            break
+
+    # Calculate calories burned
+    # Formula: calories = MET * weight in kg * duration in hours
+    duration_hours = duration / 60
+    calories = met * weight_kg * duration_hours
+    
+    return round(calories, 2)
+
+def round_sql(value, digits):
+    # Postgres only has round(numeric, integer), SQLite accepts either
+    return func.round(cast(value, Numeric), digits)
+
+def calories_burned_sql(weight_lbs):
+    # Same formula as calculate_calories_burned(), as a SQL expression over Workout columns
+    speed_mph = Workout.distance / Workout.duration * 60
+    met = case(*[(speed_mph < max_speed, speed_met) for max_speed, speed_met in MET_BY_SPEED], else_=MAX_MET)
+    return round_sql(met * (weight_lbs * 0.453592) * (Workout.duration / 60), 2)
+
+def recalculate_workouts(*criteria):
+    """Bulk UPDATE of the stored pace and calories for matching workouts, using each profile's current weight."""
+    weight = func.coalesce(
+        select(UserProfile.weight).where(UserProfile.id == Workout.profile).scalar_subquery(),
+        DEFAULT_WEIGHT
+    )
+    return update(Workout).where(*criteria).values(
+        pace=round_sql(Workout.duration / Workout.distance, 2),
+        calories_burned=calories_burned_sql(weight)
+    )
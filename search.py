@@ -0,0 +1,65 @@
+import re
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.exc import OperationalError
+
+# External-content FTS5 index over Workout.route_nickname. The rows live in the
+# workout table; the index only stores tokens and is kept in sync by triggers,
+# so every write path (ORM, bulk insert, raw SQL) updates it.
+workout_search = table('workout_search', column('rowid'), column('rank'))
+
+FTS5_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS workout_search_ai AFTER INSERT ON workout BEGIN
+        INSERT INTO workout_search(rowid, route_nickname) VALUES (new.id, new.route_nickname);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS workout_search_ad AFTER DELETE ON workout BEGIN
+        INSERT INTO workout_search(workout_search, rowid, route_nickname) VALUES ('delete', old.id, old.route_nickname);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS workout_search_au AFTER UPDATE OF route_nickname ON workout BEGIN
+        INSERT INTO workout_search(workout_search, rowid, route_nickname) VALUES ('delete', old.id, old.route_nickname);
+        INSERT INTO workout_search(rowid, route_nickname) VALUES (new.id, new.route_nickname);
+    END""",
+]
+
+
+def setup_search(engine):
+    """Create the FTS5 index and its triggers. Returns False if FTS5 can't be used."""
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'workout_search'"
+        )).first() is not None
+        try:
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS workout_search USING fts5("
+                "route_nickname, content='workout', content_rowid='id', prefix='2 3')"
+            ))
+        except OperationalError:
+            # SQLite was built without FTS5
+            return False
+        for trigger in FTS5_TRIGGERS:
+            conn.execute(text(trigger))
+        if not exists:
+            # Index the workouts that were logged before search was set up
+            conn.execute(text("INSERT INTO workout_search(workout_search) VALUES ('rebuild')"))
+    return True
+
+
+def build_match_query(query):
+    # Every word must match as a prefix, e.g. "riv lo" -> "riv"* AND "lo"*.
+    # Quoting each token keeps FTS5 operators in user input from being parsed.
+    tokens = re.findall(r'\w+', query)
+    if not tokens:
+        return None
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def search_matches(match_query):
+    """Rowid and bm25 rank of every workout matching a build_match_query() expression."""
+    return (
+        select(workout_search.c.rowid, workout_search.c.rank)
+        .where(text('workout_search MATCH :match_query').bindparams(match_query=match_query))
+        .subquery()
+    )
@@ -0,0 +1,204 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import Date, and_, bindparam, case, cast, delete, func, insert, literal, or_, select, update
+
+from database import db, read_session
+from models import RouteRollup, Workout, WorkoutRollup
+
+PERIODS = ('week', 'month', 'year')
+
+
+def bucket_start(period, date):
+    """First day of the week (Monday), month or year containing date."""
+    day = date.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def bucket_start_sql(period):
+    # bucket_start() as a SQL expression, so full rebuilds can be a single GROUP BY
+    if db.engine.dialect.name == 'sqlite':
+        modifiers = {
+            'week': ('weekday 0', '-6 days'),
+            'month': ('start of month',),
+            'year': ('start of year',)
+        }[period]
+        return func.date(Workout.date, *modifiers)
+    return cast(func.date_trunc(period, Workout.date), Date)
+
+
+def upsert(table):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+def apply_to_rollups(workouts, sign=1):
+    """Add (sign=1) or subtract (sign=-1) workouts from their rollup buckets and routes.
+
+    workouts may be Workout objects or dicts of column values; they are
+    aggregated per bucket first so a batch costs one executemany.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    routes = defaultdict(lambda: [0, None])
+    for workout in workouts:
+        if isinstance(workout, dict):
+            profile, date, route, pace = workout['profile'], workout['date'], workout['route_nickname'], workout['pace']
+            distance, duration, calories = workout['distance'], workout['duration'], workout['calories_burned']
+        else:
+            profile, date, route, pace = workout.profile, workout.date, workout.route_nickname, workout.pace
+            distance, duration, calories = workout.distance, workout.duration, workout.calories_burned
+        route_delta = routes[(profile, route)]
+        route_delta[0] += sign
+        if pace is not None and (route_delta[1] is None or pace < route_delta[1]):
+            route_delta[1] = pace
+        for period in PERIODS:
+            delta = deltas[(profile, period, bucket_start(period, date))]
+            delta[0] += sign
+            delta[1] += sign * distance
+            delta[2] += sign * duration
+            delta[3] += sign * (calories or 0)
+    if not deltas:
+        return
+
+    stmt = upsert(WorkoutRollup.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['profile', 'period', 'bucket'],
+        set_={
+            'workout_count': WorkoutRollup.workout_count + stmt.excluded.workout_count,
+            'total_distance': WorkoutRollup.total_distance + stmt.excluded.total_distance,
+            'total_duration': WorkoutRollup.total_duration + stmt.excluded.total_duration,
+            'total_calories': WorkoutRollup.total_calories + stmt.excluded.total_calories
+        }
+    )
+    db.session.execute(stmt, [
+        {
+            'profile': profile, 'period': period, 'bucket': bucket,
+            'workout_count': count, 'total_distance': distance,
+            'total_duration': duration, 'total_calories': calories
+        }
+        for (profile, period, bucket), (count, distance, duration, calories) in deltas.items()
+    ])
+    if sign < 0:
+        db.session.execute(delete(WorkoutRollup).where(WorkoutRollup.workout_count <= 0))
+    apply_to_routes(routes)
+
+
+def apply_to_routes(routes):
+    # routes maps (profile, route_nickname) to [workout count delta, best pace among those workouts]
+    table = RouteRollup.__table__
+    stmt = upsert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['profile', 'route_nickname'],
+        set_={
+            'workout_count': table.c.workout_count + stmt.excluded.workout_count,
+            # Adding workouts can only lower the best pace; removals are handled below
+            'best_pace': case(
+                (and_(stmt.excluded.workout_count > 0, or_(
+                    table.c.best_pace.is_(None), stmt.excluded.best_pace < table.c.best_pace
+                )), stmt.excluded.best_pace),
+                else_=table.c.best_pace
+            )
+        }
+    )
+    db.session.execute(stmt, [
+        {'profile': profile, 'route_nickname': route, 'workout_count': count, 'best_pace': pace}
+        for (profile, route), (count, pace) in routes.items()
+    ])
+
+    removed = [
+        {'p_profile': profile, 'p_route': route, 'p_pace': pace}
+        for (profile, route), (count, pace) in routes.items()
+        if count < 0 and pace is not None
+    ]
+    if removed:
+        db.session.flush()  # The deleted workouts must be gone before looking for the next best
+        best_pace = select(func.min(Workout.pace)).where(
+            Workout.profile == table.c.profile, Workout.route_nickname == table.c.route_nickname
+        ).scalar_subquery()
+        # Only routes whose best workout was removed are recomputed, each one an index lookup
+        db.session.execute(
+            update(table)
+            .where(
+                table.c.profile == bindparam('p_profile'),
+                table.c.route_nickname == bindparam('p_route'),
+                table.c.best_pace >= bindparam('p_pace')
+            )
+            .values(best_pace=best_pace),
+            removed
+        )
+        db.session.execute(delete(table).where(table.c.workout_count <= 0))
+
+
+def rebuild_rollups(profile_id=None):
+    """Recompute rollups from the workout table, for one profile or all of them."""
+    for model in (WorkoutRollup, RouteRollup):
+        clear = delete(model)
+        if profile_id is not None:
+            clear = clear.where(model.profile == profile_id)
+        db.session.execute(clear)
+
+    for period in PERIODS:
+        bucket = bucket_start_sql(period)
+        totals = select(
+            Workout.profile, literal(period), bucket, func.count(),
+            func.sum(Workout.distance), func.sum(Workout.duration), func.coalesce(func.sum(Workout.calories_burned), 0)
+        ).group_by(Workout.profile, bucket)
+        if profile_id is not None:
+            totals = totals.where(Workout.profile == profile_id)
+        db.session.execute(insert(WorkoutRollup).from_select(
+            ['profile', 'period', 'bucket', 'workout_count', 'total_distance', 'total_duration', 'total_calories'],
+            totals
+        ))
+
+    routes = select(
+        Workout.profile, Workout.route_nickname, func.count(), func.min(Workout.pace)
+    ).group_by(Workout.profile, Workout.route_nickname)
+    if profile_id is not None:
+        routes = routes.where(Workout.profile == profile_id)
+    db.session.execute(insert(RouteRollup).from_select(
+        ['profile', 'route_nickname', 'workout_count', 'best_pace'], routes
+    ))
+
+
+def profile_stats(profile_id, max_routes=50):
+    rollups = read_session.scalars(
+        select(WorkoutRollup).where(WorkoutRollup.profile == profile_id).order_by(WorkoutRollup.bucket.desc())
+    ).all()
+    by_period = {period: [rollup for rollup in rollups if rollup.period == period] for period in PERIODS}
+
+    years = by_period['year']
+    workout_count = sum(rollup.workout_count for rollup in years)
+    total_distance = sum(rollup.total_distance for rollup in years)
+    total_duration = sum(rollup.total_duration for rollup in years)
+
+    # The most run routes, read from route_rollup instead of grouping the workouts
+    routes = read_session.scalars(
+        select(RouteRollup)
+        .where(RouteRollup.profile == profile_id)
+        .order_by(RouteRollup.workout_count.desc(), RouteRollup.route_nickname)
+        .limit(max_routes)
+    ).all()
+
+    return {
+        'profile': profile_id,
+        'totals': {
+            'workouts': workout_count,
+            'distance': round(total_distance, 2),
+            'duration': round(total_duration, 2),
+            'calories_burned': round(sum(rollup.total_calories for rollup in years), 2),
+            'avg_distance': round(total_distance / workout_count, 2) if workout_count else None,
+            'avg_duration': round(total_duration / workout_count, 2) if workout_count else None,
+            'avg_pace': round(total_duration / total_distance, 2) if total_distance else None
+        },
+        'weekly': [rollup.to_dict() for rollup in by_period['week']],
+        'monthly': [rollup.to_dict() for rollup in by_period['month']],
+        'yearly': [rollup.to_dict() for rollup in years],
+        'best_pace_by_route': [route.to_dict() for route in routes]
+    }
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'UPLOAD_FOLDER': str(uploads)
+    })
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_workout():
+    def make_workout(**overrides):
+        return dict({
+            'profile': 1,
+            'duration': 30,
+            'distance': 3,
+            'route_nickname': 'Park Loop',
+            'date': '2024-01-01T10:00'
+        }, **overrides)
+    return make_workout
@@ -0,0 +1,91 @@
+import io
+import json
+
+from sqlalchemy import text
+
+from database import db
+
+
+def post_batch(client, rows):
+    return client.post('/api/v1/workouts/batch', json=rows)
+
+
+def post_chunked(client, body, content_type):
+    # No Content-Length, as with a chunked upload
+    return client.post(
+        '/api/v1/workouts/batch', input_stream=io.BytesIO(body.encode()), content_type=content_type,
+        environ_overrides={'wsgi.input_terminated': True, 'CONTENT_LENGTH': ''}
+    )
+
+
+def test_batch_reports_each_row(client, make_workout):
+    rows = [make_workout(), make_workout(duration='nan'), 'not an object', make_workout(date='soon')]
+    response = post_batch(client, rows)
+
+    assert response.status_code == 200
+    assert response.json['created'] == 1
+    assert response.json['errors'] == 3
+    assert [result['status'] for result in response.json['results']] == ['created', 'error', 'error', 'error']
+
+
+def test_batch_idempotency_keys(client, make_workout):
+    first = post_batch(client, [make_workout(idempotency_key='a'), make_workout(idempotency_key='b')]).json
+    ids = {result['id'] for result in first['results']}
+
+    # A retry of the whole batch, plus a new row repeated within the batch
+    retry = post_batch(client, [
+        make_workout(idempotency_key='a'), make_workout(idempotency_key='b'),
+        make_workout(idempotency_key='c'), make_workout(idempotency_key='c')
+    ]).json
+
+    assert retry['created'] == 1
+    assert retry['duplicates'] == 3
+    results = retry['results']
+    assert {results[0]['id'], results[1]['id']} == ids
+    assert results[3]['id'] == results[2]['id']
+    assert len(client.get('/api/v1/workouts').json) == 3
+
+
+def test_failing_row_only_fails_itself(app, client, make_workout):
+    with app.app_context():
+        db.session.execute(text(
+            "CREATE TRIGGER reject_boom BEFORE INSERT ON workout WHEN new.route_nickname = 'Boom' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        ))
+        db.session.commit()
+    rows = [make_workout(idempotency_key=str(i)) for i in range(4)]
+    rows.insert(2, make_workout(route_nickname='Boom'))
+
+    response = post_batch(client, rows).json
+
+    assert response['created'] == 4
+    assert response['errors'] == 1
+    assert response['results'][2]['status'] == 'error'
+    # The retried rows still show up in the rollups
+    assert client.get('/api/v1/profile/1/stats').json['totals']['workouts'] == 4
+
+
+def test_batch_creates_missing_profiles(client, make_workout):
+    post_batch(client, [make_workout(profile=9), make_workout(profile=9)])
+
+    assert client.get('/api/v1/profile/9').json == {'id': 9, 'name': 'Unknown', 'weight': 150.0}
+    assert client.get('/api/v1/profile/9/stats').json['totals']['workouts'] == 2
+
+
+def test_row_limit(app, client, make_workout):
+    app.config['WORKOUTS_BATCH_MAX_ROWS'] = 3
+    assert post_batch(client, [make_workout()] * 4).status_code == 413
+    body = '\n'.join(json.dumps(make_workout()) for _ in range(4))
+    assert post_chunked(client, body, 'application/x-ndjson').status_code == 413
+    assert post_batch(client, [make_workout()] * 3).status_code == 200
+
+
+def test_byte_limit(app, client, make_workout):
+    app.config['WORKOUTS_BATCH_MAX_BYTES'] = 1000
+    rows = [make_workout(route_nickname='x' * 90)] * 10
+
+    assert post_batch(client, rows).status_code == 413
+    assert post_chunked(client, json.dumps(rows), 'application/json').status_code == 413
+    assert post_chunked(client, '\n'.join(json.dumps(row) for row in rows), 'application/x-ndjson').status_code == 413
+    assert post_chunked(client, json.dumps(rows[:2]), 'application/json').json['created'] == 2
+    assert len(client.get('/api/v1/workouts').json) == 2
@@ -0,0 +1,77 @@
+from sqlalchemy import select
+
+from database import db
+from models import TableVersion
+
+
+def table_versions(app):
+    with app.app_context():
+        return dict(db.session.execute(select(TableVersion.name, TableVersion.version)).all())
+
+
+def test_writes_bump_the_tables_they_touch(app, client, make_workout):
+    before = table_versions(app)
+    client.post('/api/v1/workouts/batch', json=[make_workout()])
+    after_create = table_versions(app)
+
+    assert after_create['workout'] == before['workout'] + 1
+    assert after_create['workout_rollup'] == before['workout_rollup'] + 1
+    assert after_create['route_rollup'] == before['route_rollup'] + 1
+
+    client.patch('/api/v1/profile/1', json={'weight': 170})
+    after_patch = table_versions(app)
+    assert after_patch['user_profile'] == after_create['user_profile'] + 1
+
+
+def test_reads_and_rolled_back_writes_do_not_bump(app, client, make_workout):
+    client.get('/api/v1/profile')
+    before = table_versions(app)
+
+    client.get('/api/v1/workouts')
+    client.post('/api/v1/workouts/batch', json=[make_workout(duration='nan')])
+
+    assert table_versions(app) == before
+
+
+def test_conditional_get(client):
+    client.get('/api/v1/profile')  # Creates the default profile
+    response = client.get('/api/v1/profile/1')
+    etag = response.headers['ETag']
+    assert 'Last-Modified' in response.headers
+
+    assert client.get('/api/v1/profile/1', headers={'If-None-Match': etag}).status_code == 304
+
+    client.patch('/api/v1/profile/1', json={'weight': 170})
+    response = client.get('/api/v1/profile/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['weight'] == 170.0
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since_alone_never_gives_304(client):
+    client.get('/api/v1/profile')  # Creates the default profile
+    # One-second precision would hide a write in the same second as the read
+    last_modified = client.get('/api/v1/profile/1').headers['Last-Modified']
+    client.patch('/api/v1/profile/1', json={'weight': 170})
+
+    response = client.get('/api/v1/profile/1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert response.json['weight'] == 170.0
+
+
+def test_errors_are_not_turned_into_304(client):
+    client.get('/api/v1/profile')  # Creates the default profile
+    etag = client.get('/api/v1/profile/1').headers['ETag']
+
+    assert client.get('/api/v1/profile/999', headers={'If-None-Match': etag}).status_code == 404
+    workouts_etag = client.get('/api/v1/workouts').headers['ETag']
+    assert client.get('/api/v1/workouts?cursor=bad', headers={'If-None-Match': workouts_etag}).status_code == 400
+
+
+def test_response_cache_serves_until_a_write(client, make_workout):
+    client.get('/api/v1/workouts')
+    client.get('/api/v1/workouts')
+    assert client.get('/api/v1/cache/stats').json['hits'] == 1
+
+    client.post('/api/v1/workouts/batch', json=[make_workout()])
+    assert len(client.get('/api/v1/workouts').json) == 1
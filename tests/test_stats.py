@@ -0,0 +1,95 @@
+from sqlalchemy import select
+
+from database import db
+from models import RouteRollup, Workout, WorkoutRollup, calculate_calories_burned, calculate_pace, recalculate_workouts
+from stats import rebuild_rollups
+
+
+def rollup_rows(app):
+    with app.app_context():
+        rollups = db.session.execute(select(
+            WorkoutRollup.profile, WorkoutRollup.period, WorkoutRollup.bucket, WorkoutRollup.workout_count,
+            WorkoutRollup.total_distance, WorkoutRollup.total_duration, WorkoutRollup.total_calories
+        )).all()
+        routes = db.session.execute(select(
+            RouteRollup.profile, RouteRollup.route_nickname, RouteRollup.workout_count, RouteRollup.best_pace
+        )).all()
+        return (
+            sorted((row[:4] + tuple(round(value, 6) for value in row[4:])) for row in rollups),
+            sorted(routes)
+        )
+
+
+def assert_rollups_match_rebuild(app):
+    incremental = rollup_rows(app)
+    with app.app_context():
+        rebuild_rollups()
+        db.session.commit()
+    assert incremental == rollup_rows(app)
+
+
+def test_incremental_rollups_match_rebuild(app, client, make_workout):
+    client.put('/api/v1/profile', json={'name': 'Ann', 'weight': 140})
+    rows = [
+        make_workout(profile=profile, route_nickname=route, duration=duration, date=date)
+        for profile, route, duration, date in [
+            (1, 'Park Loop', 30, '2023-12-31T08:00'),
+            (1, 'Park Loop', 24, '2024-01-01T08:00'),
+            (1, 'River Run', 40, '2024-02-10T08:00'),
+            (2, 'Park Loop', 27, '2024-01-03T08:00'),
+            (2, 'Hill Repeats', 35, '2025-06-01T08:00'),
+        ]
+    ]
+    ids = [result['id'] for result in client.post('/api/v1/workouts/batch', json=rows).json['results']]
+    client.post('/api/v1/workouts', data={key: str(value) for key, value in make_workout(duration=45).items()},
+                content_type='multipart/form-data')
+    assert_rollups_match_rebuild(app)
+
+    # Deleting the fastest Park Loop workout has to find the next best one
+    client.delete(f"/api/v1/workouts/{ids[1]}")
+    client.delete(f"/api/v1/workouts/{ids[4]}")
+    client.patch('/api/v1/profile/1', json={'weight': 180})
+    assert_rollups_match_rebuild(app)
+
+    routes = client.get('/api/v1/profile/1/stats').json['best_pace_by_route']
+    assert {route['route_nickname']: route['best_pace'] for route in routes} == {'Park Loop': 10.0, 'River Run': 13.33}
+
+
+def test_stats_totals(client, make_workout):
+    client.post('/api/v1/workouts/batch', json=[
+        make_workout(duration=30, distance=3, date='2024-01-01T08:00'),
+        make_workout(duration=20, distance=2, date='2024-01-08T08:00'),
+    ])
+    stats = client.get('/api/v1/profile/1/stats').json
+
+    assert stats['totals']['workouts'] == 2
+    assert stats['totals']['distance'] == 5.0
+    assert stats['totals']['avg_pace'] == 10.0
+    assert [week['period_start'] for week in stats['weekly']] == ['2024-01-08', '2024-01-01']
+    assert [month['period_start'] for month in stats['monthly']] == ['2024-01-01']
+
+
+def test_best_pace_lists_most_run_routes(app, client, make_workout):
+    app.config['STATS_MAX_ROUTES'] = 2
+    rows = [make_workout(route_nickname=route) for route in ['A', 'B', 'B', 'C', 'C', 'C']]
+    client.post('/api/v1/workouts/batch', json=rows)
+
+    routes = client.get('/api/v1/profile/1/stats').json['best_pace_by_route']
+    assert [(route['route_nickname'], route['workouts']) for route in routes] == [('C', 3), ('B', 2)]
+
+
+def test_stats_for_missing_profile(client):
+    assert client.get('/api/v1/profile/999/stats').status_code == 404
+
+
+def test_recalculate_matches_python(app, client, make_workout):
+    client.put('/api/v1/profile', json={'name': 'Ann', 'weight': 147.3})
+    rows = [make_workout(duration=duration, distance=distance) for duration, distance in [(30, 3), (21, 4.1), (95, 7.3), (12, 1)]]
+    client.post('/api/v1/workouts/batch', json=rows)
+
+    with app.app_context():
+        db.session.execute(recalculate_workouts())
+        db.session.commit()
+        for workout in db.session.scalars(select(Workout)):
+            assert workout.pace == calculate_pace(workout.duration, workout.distance)
+            assert workout.calories_burned == calculate_calories_burned(workout.duration, workout.distance, 147.3)
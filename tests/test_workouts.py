@@ -0,0 +1,85 @@
+import pytest
+
+
+def create(client, workout):
+    form = {key: str(value) for key, value in workout.items()}
+    return client.post('/api/v1/workouts', data=form, content_type='multipart/form-data')
+
+
+def all_pages(client, path):
+    pages = []
+    response = client.get(path)
+    while True:
+        assert response.status_code == 200
+        pages.append(response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return pages
+        separator = '&' if '?' in path else '?'
+        response = client.get(f"{path}{separator}cursor={cursor}")
+
+
+def test_cursor_pages_cover_every_workout_once_in_order(client, make_workout):
+    # Several workouts share a date, so the id has to break ties between pages
+    rows = [make_workout(date=f"2024-01-0{i % 3 + 1}T10:00") for i in range(11)]
+    assert client.post('/api/v1/workouts/batch', json=rows).json['created'] == 11
+
+    pages = all_pages(client, '/api/v1/workouts?limit=4')
+
+    assert [len(page) for page in pages] == [4, 4, 3]
+    workouts = [workout for page in pages for workout in page]
+    keys = [(workout['date'], workout['id']) for workout in workouts]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 11
+
+
+def test_search_keeps_its_query_across_pages(client, make_workout):
+    rows = [make_workout(route_nickname='River Run' if i % 2 else 'Park Loop', date=f"2024-01-{i + 1:02d}T10:00") for i in range(10)]
+    client.post('/api/v1/workouts/batch', json=rows)
+
+    pages = all_pages(client, '/api/v1/workouts?q=river&limit=2')
+
+    workouts = [workout for page in pages for workout in page]
+    assert len(workouts) == 5
+    assert {workout['route_nickname'] for workout in workouts} == {'River Run'}
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get('/api/v1/workouts?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('overrides', [
+    {'duration': 'x'},
+    {'duration': 'nan'},
+    {'distance': 'inf'},
+    {'distance': '0'},
+    {'date': 'yesterday'},
+    {'profile': 'abc'},
+])
+def test_create_rejects_invalid_workouts(client, make_workout, overrides):
+    response = create(client, make_workout(**overrides))
+    assert response.status_code == 400
+    assert response.json['message']
+
+
+def test_create_derives_pace_and_calories(client, make_workout):
+    response = create(client, make_workout(duration=30, distance=3))
+    assert response.status_code == 201
+    assert response.json['pace'] == 10.0
+    assert response.json['calories_burned'] > 0
+
+
+def test_create_with_idempotency_key_stores_once(client, make_workout):
+    first = create(client, make_workout(idempotency_key='sync-1'))
+    retry = create(client, make_workout(idempotency_key='sync-1'))
+
+    assert first.status_code == 201
+    assert retry.status_code == 200
+    assert retry.json['id'] == first.json['id']
+    assert len(client.get('/api/v1/workouts').json) == 1
+
+
+def test_create_for_missing_profile_creates_it(client, make_workout):
+    assert create(client, make_workout(profile=7)).status_code == 201
+    assert client.get('/api/v1/profile/7').json['name'] == 'Unknown'